@@ -1,16 +1,22 @@
-import os
+import subprocess
 import sys
+from functools import lru_cache
 from os.path import dirname, realpath
 from pathlib import Path
 from shutil import rmtree
 
-import toml
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11
+    import tomli as tomllib
 
 PROJECT_ROOT = dirname(realpath(__file__))
 
-with open(Path(PROJECT_ROOT) / "pyproject.toml") as f_read:
-    content = toml.load(f_read)
-    __version__ = content["tool"]["poetry"]["version"]
+
+@lru_cache(maxsize=None)
+def get_version() -> str:
+    with open(Path(PROJECT_ROOT) / "pyproject.toml", "rb") as f_read:
+        return tomllib.load(f_read)["tool"]["poetry"]["version"]
 
 
 class UploadCommand:
@@ -18,6 +24,10 @@ class UploadCommand:
     def status(s):
         print(f"✨✨ {s}")
 
+    @staticmethod
+    def run_command(*args: str) -> int:
+        return subprocess.run(args, check=False).returncode
+
     def initialize_options(self):
         pass
 
@@ -26,9 +36,9 @@ class UploadCommand:
 
     def git_commit_main(self) -> int:
         self.status("Pushing git commits...")
-        os.system("git add .")
-        os.system(f'git commit -m "{__version__}"')
-        return os.system("git push origin main")
+        self.run_command("git", "add", ".")
+        self.run_command("git", "commit", "-m", get_version())
+        return self.run_command("git", "push", "origin", "main")
 
     def run(self):
         try:
@@ -38,20 +48,26 @@ class UploadCommand:
             pass
 
         self.status("Building Source and Wheel distribution…")
-        os.system("poetry build")
+        self.run_command("poetry", "build")
 
         self.status("Uploading the package to PyPI via poetry…")
-        return_code = os.system("poetry publish -vv")
+        return_code = self.run_command("poetry", "publish", "-vv")
 
         if not return_code:
             push_to_main_code = self.git_commit_main()
 
             if not push_to_main_code:
+                version = get_version()
                 self.status("Pushing git tags…")
-                os.system(
-                    'git tag -a v{0} -m "release version v{0}"'.format(__version__)
+                self.run_command(
+                    "git",
+                    "tag",
+                    "-a",
+                    f"v{version}",
+                    "-m",
+                    f"release version v{version}",
                 )
-                os.system(f"git push origin v{__version__}")
+                self.run_command("git", "push", "origin", f"v{version}")
 
         sys.exit()
 
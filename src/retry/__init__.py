@@ -1,9 +1,16 @@
-__all__ = ["retry", "retry_call"]
+__all__ = [
+    "retry",
+    "retry_call",
+    "retry_async",
+    "retry_call_async",
+    "AdaptiveBackoff",
+]
 
 
 import logging
 
-from .api import retry, retry_call
+from .api import retry, retry_async, retry_call, retry_call_async
+from .backoff import AdaptiveBackoff
 from .compat import NullHandler
 
 log = logging.getLogger(__name__)
@@ -1,60 +1,356 @@
 import logging
-import random
+import os
 import time
-from functools import partial
-from typing import Any, Callable, Optional, Union
+from functools import wraps
+from math import isinf
+from typing import Any, Callable, Iterator, Literal, Optional, Union
+from weakref import WeakSet
 
-from .compat import decorator
+from .backoff import AdaptiveBackoff
 
 logging_logger = logging.getLogger(__name__)
-formatter = "%(asctime)s - %(name)s - L%(lineno)d - %(levelname)s - %(message)s"
-logging.basicConfig(format=formatter)
+
+NS_PER_SECOND = 1_000_000_000
+
+
+class _JitterPool:
+    """
+    Jitter values sampled ahead of time from a (min, max) range in nanoseconds.
+
+    Values are handed out round-robin and the whole pool is sampled again every
+    REFRESH draws, which is far cheaper than drawing a random number per retry.
+    Jitter only has to spread retries out, so reusing samples is fine.
+
+    A forked child would inherit the samples and the generator state of its parent
+    and retry in lockstep with it, so every pool is reseeded in the child.
+    """
+
+    SIZE = 64  # a power of two, so that the index can be wrapped with a mask
+    REFRESH = 1024
+
+    __slots__ = ("low_ns", "high_ns", "values", "_random", "_index", "__weakref__")
+
+    def __init__(self, low_ns: int, high_ns: int) -> None:
+        from random import Random
+
+        self.low_ns = low_ns
+        self.high_ns = high_ns
+        self._random = Random()
+        self._index = 0
+        self._sample()
+        _jitter_pools.add(self)
+
+    def _reseed(self) -> None:
+        self._random.seed()
+        self._sample()
+
+    def _sample(self) -> None:
+        uniform, low_ns, high_ns = self._random.uniform, self.low_ns, self.high_ns
+        self.values = [round(uniform(low_ns, high_ns)) for _ in range(self.SIZE)]
+
+    def draw(self) -> int:
+        """Returns the next jitter value, in nanoseconds."""
+        index = self._index = self._index + 1
+        if not index % self.REFRESH:
+            self._sample()
+        return self.values[index & (self.SIZE - 1)]
+
+
+# every live pool, so that a forked child can reseed them
+_jitter_pools: "WeakSet[_JitterPool]" = WeakSet()
+
+
+def _reseed_jitter_pools() -> None:
+    for pool in _jitter_pools:
+        pool._reseed()
+
+
+if hasattr(os, "register_at_fork"):  # not available on Windows
+    os.register_at_fork(after_in_child=_reseed_jitter_pools)
+
+
+def _normalize_jitter(
+    jitter: Union[int, float, tuple[Union[int, float], Union[int, float]]],
+    pool: bool = False,
+) -> Union[int, tuple[int, int], _JitterPool]:
+    """
+    Converts jitter to nanoseconds, so the retry loop never has to check the type of
+    jitter again: an int if it is fixed, otherwise the (min, max) range, or a
+    _JitterPool sampled from it if pool is set.
+
+    A pool costs a seeded generator and 64 samples to build, which only pays off
+    when it is reused across calls, as by a decorator.
+    """
+    if isinstance(jitter, tuple):
+        low, high = jitter
+        low_ns, high_ns = round(low * NS_PER_SECOND), round(high * NS_PER_SECOND)
+        if low_ns == high_ns:
+            return low_ns
+        return _JitterPool(low_ns, high_ns) if pool else (low_ns, high_ns)
+    return round(jitter * NS_PER_SECOND)
+
+
+class RetryConfig:
+    """
+    The arguments of a retry loop, checked and normalised once.
+
+    A decorator builds its config when it is created and shares it between all the
+    calls of the decorated function, retry_call builds one per call. It is not meant
+    to be modified once built.
+    """
+
+    __slots__ = (
+        "exceptions",
+        "tries",
+        "delay",
+        "max_delay",
+        "backoff",
+        "jitter",
+        "logger",
+        "jitter_mode",
+        "should_retry",
+    )
+
+    def __init__(
+        self,
+        exceptions: Union[Exception, tuple[Exception, ...]],
+        tries: int,
+        delay: Union[int, float],
+        max_delay: Optional[Union[int, float]],
+        backoff: Union[int, float, AdaptiveBackoff],
+        jitter: Union[int, float, tuple[Union[int, float], Union[int, float]]],
+        logger: Optional[logging.Logger],
+        jitter_mode: Literal["fixed", "full", "decorrelated"],
+        should_retry: Optional[Callable[[BaseException], bool]],
+        pool_jitter: bool = False,
+    ) -> None:
+        if jitter_mode not in ("fixed", "full", "decorrelated"):
+            raise ValueError(f"unknown jitter_mode: {jitter_mode!r}")
+        # the randomised modes draw their own sleeps, reject what they would ignore
+        if jitter_mode != "fixed" and jitter and _normalize_jitter(jitter):
+            raise ValueError(f"jitter is not supported by jitter_mode {jitter_mode!r}")
+        if jitter_mode == "decorrelated" and backoff != 1:
+            raise ValueError("backoff is not supported by jitter_mode 'decorrelated'")
+
+        self.exceptions = exceptions
+        self.tries = tries
+        self.delay = delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.jitter = (
+            _normalize_jitter(jitter, pool_jitter)
+            if jitter and jitter_mode == "fixed"
+            else 0
+        )
+        self.logger = logger
+        self.jitter_mode = jitter_mode
+        self.should_retry = should_retry
+
+
+def _jitter_sampler(
+    jitter: Union[int, tuple[int, int], _JitterPool],
+) -> Optional[Callable[[], int]]:
+    """
+    Returns a function drawing jitter values in nanoseconds from a normalised random
+    jitter, or None if the jitter is fixed.
+    """
+    if isinstance(jitter, _JitterPool):
+        return jitter.draw
+    if isinstance(jitter, int):
+        return None
+
+    from random import uniform
+
+    low_ns, high_ns = jitter
+
+    def draw() -> int:
+        return round(uniform(low_ns, high_ns))
+
+    return draw
+
+
+def _warner(logger: Optional[logging.Logger]) -> Optional[Callable[..., None]]:
+    """
+    Returns logger.warning, or None if logging is disabled or warnings are filtered
+    out. Loggers without isEnabledFor, such as loguru's, always get the warning.
+    """
+    if not logger:
+        return None
+    is_enabled_for = getattr(logger, "isEnabledFor", None)
+    if is_enabled_for is None or is_enabled_for(logging.WARNING):
+        return logger.warning
+    return None
+
+
+def _delays(config: RetryConfig) -> Iterator[float]:
+    """
+    Yields the successive sleeps between attempts, in seconds.
+
+    Each sleep is only computed when it is requested, so an AdaptiveBackoff sees
+    every failure recorded before it is asked for a delay.
+    """
+    delay, max_delay, backoff = config.delay, config.max_delay, config.backoff
+    jitter = config.jitter
+    draw_jitter = _jitter_sampler(jitter)
+    random_jitter = draw_jitter is not None
+    adaptive_backoff = isinstance(backoff, AdaptiveBackoff)
+    full_jitter = config.jitter_mode == "full"
+    decorrelated_jitter = config.jitter_mode == "decorrelated"
+    if full_jitter or decorrelated_jitter:
+        # only pay for importing random when the schedule is randomised
+        from random import uniform
+
+    # the schedule is kept in integer nanoseconds so that repeated backoffs do not
+    # accumulate floating point rounding errors
+    delay_ns = round(delay * NS_PER_SECOND)
+    # without a limit, clamp to infinity so the loop can call min() unconditionally
+    if not max_delay or isinf(max_delay):
+        max_delay_ns = float("inf")
+    else:
+        max_delay_ns = round(max_delay * NS_PER_SECOND)
+    if not adaptive_backoff:
+        backoff_num, backoff_den = backoff.as_integer_ratio()
+
+    _delay_ns = delay_ns
+    if adaptive_backoff:
+        # the failure that led to the first sleep is already recorded, so the first
+        # sleep follows the failure rate too
+        _delay_ns = min(round(backoff.next_delay(delay_ns)), max_delay_ns)
+    while True:
+        if decorrelated_jitter:
+            # every sleep is drawn, the first one included, so that clients which
+            # failed together do not retry in lockstep
+            _delay_ns = min(round(uniform(delay_ns, _delay_ns * 3)), max_delay_ns)
+
+        sleep_ns = uniform(0, _delay_ns) if full_jitter else _delay_ns
+        # whole seconds stay ints, so the warning keeps reading "retrying in 1 seconds"
+        seconds, remainder = divmod(sleep_ns, NS_PER_SECOND)
+        yield sleep_ns / NS_PER_SECOND if remainder else seconds
+
+        if not decorrelated_jitter:
+            if adaptive_backoff:
+                _delay_ns = round(backoff.next_delay(delay_ns))
+            else:
+                _delay_ns = _delay_ns * backoff_num // backoff_den
+            if not full_jitter:
+                _delay_ns += draw_jitter() if random_jitter else jitter
+            _delay_ns = min(_delay_ns, max_delay_ns)
 
 
 def __retry_internal(
     f: Callable,
-    exceptions: Union[Exception, tuple[Exception, ...]] = Exception,
-    tries: int = -1,
-    delay: int = 0,
-    max_delay: Optional[int] = None,
-    backoff: int = 1,
-    jitter: Union[int, float, tuple[Union[int, float], Union[int, float]]] = 0,
-    logger: Optional[logging.Logger] = logging_logger,
+    f_args: Union[list, tuple],
+    f_kwargs: Optional[dict],
+    config: RetryConfig,
 ) -> Any:
     """
     Executes a function and retries it if it failed.
 
     :param f: the function to execute.
-    :param exceptions: an exception or a tuple of exceptions to catch. default: Exception.
-    :param tries: the maximum number of attempts. default: -1 (infinite).
-    :param delay: initial delay between attempts. default: 0.
-    :param max_delay: the maximum value of delay. default: None (no limit).
-    :param backoff: multiplier applied to delay between attempts. default: 1 (no backoff).
-    :param jitter: extra seconds added to delay between attempts. default: 0.
-                    fixed if a number, random if a range tuple (min, max)
-    :param logger: logger.warning(fmt, error, delay) will be called on failed attempts.
-                    default: retry.logging_logger. if None, logging is disabled.
+    :param f_args: the positional arguments of the function to execute.
+    :param f_kwargs: the named arguments of the function to execute.
+    :param config: the retry arguments.
+    :returns: the result of the f function.
+    """
+    exceptions, _tries, backoff = config.exceptions, config.tries, config.backoff
+    logger, should_retry = config.logger, config.should_retry
+    f_kwargs = f_kwargs or {}
+    delays = None
+    adaptive_backoff = isinstance(backoff, AdaptiveBackoff)
+
+    while _tries:
+        try:
+            result = f(*f_args, **f_kwargs)
+        except exceptions as e:
+            if adaptive_backoff:
+                backoff.record(True)
+
+            _tries -= 1
+            if not _tries or (should_retry and not should_retry(e)):
+                raise
+
+            if delays is None:
+                # only calls that actually fail pay for the schedule and the logging
+                # check, which is then done once per call
+                delays = _delays(config)
+                warn = _warner(logger)
+            _sleep = next(delays)
+            if warn:
+                warn("%s, retrying in %s seconds...", e, _sleep)
+
+            if _sleep > 0:
+                time.sleep(_sleep)
+        else:
+            if adaptive_backoff:
+                backoff.record(False)
+            return result
+
+
+async def __retry_internal_async(
+    f: Callable,
+    f_args: Union[list, tuple],
+    f_kwargs: Optional[dict],
+    config: RetryConfig,
+) -> Any:
+    """
+    Executes a coroutine function and retries it if it failed, without blocking the
+    event loop between attempts.
+
+    :param f: the coroutine function to execute, or a function returning an awaitable.
+    :param f_args: the positional arguments of the function to execute.
+    :param f_kwargs: the named arguments of the function to execute.
+    :param config: the retry arguments.
     :returns: the result of the f function.
     """
-    _tries, _delay = tries, delay
+    # asyncio is only imported by applications that actually retry coroutines
+    import asyncio
+    from inspect import isawaitable
+
+    exceptions, _tries, backoff = config.exceptions, config.tries, config.backoff
+    logger, should_retry = config.logger, config.should_retry
+    f_kwargs = f_kwargs or {}
+    delays = None
+    adaptive_backoff = isinstance(backoff, AdaptiveBackoff)
 
     while _tries:
         try:
-            return f()
+            result = f(*f_args, **f_kwargs)
+            if isawaitable(result):
+                result = await result
         except exceptions as e:
+            if adaptive_backoff:
+                backoff.record(True)
+
             _tries -= 1
-            if not _tries:
+            if not _tries or (should_retry and not should_retry(e)):
                 raise
 
-            if logger:
-                logger.warning(f"{e}, retrying in {_delay} seconds...")
+            if delays is None:
+                # only calls that actually fail pay for the schedule and the logging
+                # check, which is then done once per call
+                delays = _delays(config)
+                warn = _warner(logger)
+            _sleep = next(delays)
+            if warn:
+                warn("%s, retrying in %s seconds...", e, _sleep)
+
+            # always yield, even for a zero delay, so other tasks get to run between
+            # attempts; asyncio.sleep(0) does not make a syscall
+            await asyncio.sleep(_sleep)
+        else:
+            if adaptive_backoff:
+                backoff.record(False)
+            return result
+
+
+def _async_wrapper(f: Callable, config: RetryConfig) -> Callable:
+    """Wraps a coroutine function so that awaiting it retries it with config."""
 
-            time.sleep(_delay)
-            _delay *= backoff
+    @wraps(f)
+    async def wrapper(*f_args, **f_kwargs):
+        return await __retry_internal_async(f, f_args, f_kwargs, config)
 
-            _delay += random.uniform(*jitter) if isinstance(jitter, tuple) else jitter
-            if max_delay:
-                _delay = min(_delay, max_delay)
+    return wrapper
 
 
 def retry(
@@ -62,9 +358,11 @@ def retry(
     tries: int = -1,
     delay: int = 0,
     max_delay: Optional[int] = None,
-    backoff: int = 1,
+    backoff: Union[int, float, AdaptiveBackoff] = 1,
     jitter: Union[int, float, tuple[Union[int, float], Union[int, float]]] = 0,
     logger: Optional[logging.Logger] = logging_logger,
+    jitter_mode: Literal["fixed", "full", "decorrelated"] = "fixed",
+    should_retry: Optional[Callable[[BaseException], bool]] = None,
 ) -> Callable:
     """Returns a retry decorator.
 
@@ -73,27 +371,44 @@ def retry(
     :param delay: initial delay between attempts. default: 0.
     :param max_delay: the maximum value of delay. default: None (no limit).
     :param backoff: multiplier applied to delay between attempts. default: 1 (no backoff).
+                    an AdaptiveBackoff derives the delay from the recent failure rate instead.
     :param jitter: extra seconds added to delay between attempts. default: 0.
                     fixed if a number, random if a range tuple (min, max)
     :param logger: logger.warning(fmt, error, delay) will be called on failed attempts.
                     default: retry.logging_logger. if None, logging is disabled.
-    :returns: a retry decorator.
+    :param jitter_mode: how the delay between attempts is randomised. default: "fixed".
+                    "fixed" adds jitter to the backoff schedule,
+                    "full" sleeps a random time between 0 and the backoff schedule,
+                    "decorrelated" sleeps a random time between delay and 3x the previous sleep.
+                    only "fixed" takes a jitter, and "decorrelated" takes no backoff.
+    :param should_retry: called with each caught exception, which is re-raised right away
+                    if it returns False. default: None (every caught exception is retried).
+    :returns: a retry decorator. coroutine functions are retried with retry_async.
     """
+    config = RetryConfig(
+        exceptions,
+        tries,
+        delay,
+        max_delay,
+        backoff,
+        jitter,
+        logger,
+        jitter_mode,
+        should_retry,
+        pool_jitter=True,
+    )
 
-    @decorator
-    def retry_decorator(f: Callable, *f_args, **f_kwargs):
-        args = f_args or []
-        kwargs = f_kwargs or {}
-        return __retry_internal(
-            partial(f, *args, **kwargs),
-            exceptions,
-            tries,
-            delay,
-            max_delay,
-            backoff,
-            jitter,
-            logger,
-        )
+    def retry_decorator(f: Callable) -> Callable:
+        from inspect import iscoroutinefunction
+
+        if iscoroutinefunction(f):
+            return _async_wrapper(f, config)
+
+        @wraps(f)
+        def wrapper(*f_args, **f_kwargs):
+            return __retry_internal(f, f_args, f_kwargs, config)
+
+        return wrapper
 
     return retry_decorator
 
@@ -106,9 +421,11 @@ def retry_call(
     tries: int = -1,
     delay: int = 0,
     max_delay: Optional[int] = None,
-    backoff: int = 1,
+    backoff: Union[int, float, AdaptiveBackoff] = 1,
     jitter: Union[int, float, tuple[Union[int, float], Union[int, float]]] = 0,
     logger: Optional[logging.Logger] = logging_logger,
+    jitter_mode: Literal["fixed", "full", "decorrelated"] = "fixed",
+    should_retry: Optional[Callable[[BaseException], bool]] = None,
 ) -> Callable:
     """
     Calls a function and re-executes it if it failed.
@@ -121,16 +438,71 @@ def retry_call(
     :param delay: initial delay between attempts. default: 0.
     :param max_delay: the maximum value of delay. default: None (no limit).
     :param backoff: multiplier applied to delay between attempts. default: 1 (no backoff).
+                    an AdaptiveBackoff derives the delay from the recent failure rate instead.
     :param jitter: extra seconds added to delay between attempts. default: 0.
                     fixed if a number, random if a range tuple (min, max)
     :param logger: logger.warning(fmt, error, delay) will be called on failed attempts.
                     default: retry.logging_logger. if None, logging is disabled.
+    :param jitter_mode: how the delay between attempts is randomised. default: "fixed".
+                    "fixed" adds jitter to the backoff schedule,
+                    "full" sleeps a random time between 0 and the backoff schedule,
+                    "decorrelated" sleeps a random time between delay and 3x the previous sleep.
+                    only "fixed" takes a jitter, and "decorrelated" takes no backoff.
+    :param should_retry: called with each caught exception, which is re-raised right away
+                    if it returns False. default: None (every caught exception is retried).
     :returns: the result of the f function.
     """
-    args = f_args or []
-    kwargs = f_kwargs or {}
     return __retry_internal(
-        partial(f, *args, **kwargs),
+        f,
+        f_args or (),
+        f_kwargs,
+        RetryConfig(
+            exceptions,
+            tries,
+            delay,
+            max_delay,
+            backoff,
+            jitter,
+            logger,
+            jitter_mode,
+            should_retry,
+        ),
+    )
+
+
+def retry_async(
+    exceptions: Union[Exception, tuple[Exception, ...]] = Exception,
+    tries: int = -1,
+    delay: int = 0,
+    max_delay: Optional[int] = None,
+    backoff: Union[int, float, AdaptiveBackoff] = 1,
+    jitter: Union[int, float, tuple[Union[int, float], Union[int, float]]] = 0,
+    logger: Optional[logging.Logger] = logging_logger,
+    jitter_mode: Literal["fixed", "full", "decorrelated"] = "fixed",
+    should_retry: Optional[Callable[[BaseException], bool]] = None,
+) -> Callable:
+    """Returns a retry decorator for coroutine functions.
+
+    :param exceptions: an exception or a tuple of exceptions to catch. default: Exception.
+    :param tries: the maximum number of attempts. default: -1 (infinite).
+    :param delay: initial delay between attempts. default: 0.
+    :param max_delay: the maximum value of delay. default: None (no limit).
+    :param backoff: multiplier applied to delay between attempts. default: 1 (no backoff).
+                    an AdaptiveBackoff derives the delay from the recent failure rate instead.
+    :param jitter: extra seconds added to delay between attempts. default: 0.
+                    fixed if a number, random if a range tuple (min, max)
+    :param logger: logger.warning(fmt, error, delay) will be called on failed attempts.
+                    default: retry.logging_logger. if None, logging is disabled.
+    :param jitter_mode: how the delay between attempts is randomised. default: "fixed".
+                    "fixed" adds jitter to the backoff schedule,
+                    "full" sleeps a random time between 0 and the backoff schedule,
+                    "decorrelated" sleeps a random time between delay and 3x the previous sleep.
+                    only "fixed" takes a jitter, and "decorrelated" takes no backoff.
+    :param should_retry: called with each caught exception, which is re-raised right away
+                    if it returns False. default: None (every caught exception is retried).
+    :returns: a retry decorator whose wrapper must be awaited.
+    """
+    config = RetryConfig(
         exceptions,
         tries,
         delay,
@@ -138,4 +510,69 @@ def retry_call(
         backoff,
         jitter,
         logger,
+        jitter_mode,
+        should_retry,
+        pool_jitter=True,
+    )
+
+    def retry_decorator(f: Callable) -> Callable:
+        return _async_wrapper(f, config)
+
+    return retry_decorator
+
+
+async def retry_call_async(
+    f: Callable,
+    f_args: Optional[Any] = None,
+    f_kwargs: Optional[Any] = None,
+    exceptions: Union[Exception, tuple[Exception, ...]] = Exception,
+    tries: int = -1,
+    delay: int = 0,
+    max_delay: Optional[int] = None,
+    backoff: Union[int, float, AdaptiveBackoff] = 1,
+    jitter: Union[int, float, tuple[Union[int, float], Union[int, float]]] = 0,
+    logger: Optional[logging.Logger] = logging_logger,
+    jitter_mode: Literal["fixed", "full", "decorrelated"] = "fixed",
+    should_retry: Optional[Callable[[BaseException], bool]] = None,
+) -> Any:
+    """
+    Calls a coroutine function and re-executes it if it failed.
+
+    :param f: the coroutine function to execute, or a function returning an awaitable.
+    :param f_args: the positional arguments of the function to execute.
+    :param f_kwargs: the named arguments of the function to execute.
+    :param exceptions: an exception or a tuple of exceptions to catch. default: Exception.
+    :param tries: the maximum number of attempts. default: -1 (infinite).
+    :param delay: initial delay between attempts. default: 0.
+    :param max_delay: the maximum value of delay. default: None (no limit).
+    :param backoff: multiplier applied to delay between attempts. default: 1 (no backoff).
+                    an AdaptiveBackoff derives the delay from the recent failure rate instead.
+    :param jitter: extra seconds added to delay between attempts. default: 0.
+                    fixed if a number, random if a range tuple (min, max)
+    :param logger: logger.warning(fmt, error, delay) will be called on failed attempts.
+                    default: retry.logging_logger. if None, logging is disabled.
+    :param jitter_mode: how the delay between attempts is randomised. default: "fixed".
+                    "fixed" adds jitter to the backoff schedule,
+                    "full" sleeps a random time between 0 and the backoff schedule,
+                    "decorrelated" sleeps a random time between delay and 3x the previous sleep.
+                    only "fixed" takes a jitter, and "decorrelated" takes no backoff.
+    :param should_retry: called with each caught exception, which is re-raised right away
+                    if it returns False. default: None (every caught exception is retried).
+    :returns: the result of the f function.
+    """
+    return await __retry_internal_async(
+        f,
+        f_args or (),
+        f_kwargs,
+        RetryConfig(
+            exceptions,
+            tries,
+            delay,
+            max_delay,
+            backoff,
+            jitter,
+            logger,
+            jitter_mode,
+            should_retry,
+        ),
     )
@@ -0,0 +1,64 @@
+from collections import deque
+from typing import Union
+
+
+class AdaptiveBackoff:
+    """
+    A backoff strategy that adapts the delay to the observed contention.
+
+    The outcome of the most recent attempts is kept in a sliding window, and the
+    share of failed attempts in it is used as an estimate `p` of the current
+    contention. The next delay is `delay * (1 + k * p / (1 - p))`: it stays close
+    to `delay` while most attempts succeed and grows quickly once they mostly fail.
+
+    An instance can be shared between several decorated functions so that they
+    back off together.
+    """
+
+    def __init__(
+        self,
+        k: Union[int, float] = 1,
+        window: int = 32,
+        max_failure_rate: float = 0.95,
+    ) -> None:
+        """
+        :param k: how strongly contention stretches the delay. default: 1.
+        :param window: the number of recent attempts taken into account. default: 32.
+        :param max_failure_rate: upper bound of the failure rate estimate, keeps the
+                    delay finite when every attempt in the window failed. default: 0.95.
+        :raises ValueError: if window is lower than 1 or max_failure_rate is not in [0, 1).
+        """
+        if window < 1:
+            raise ValueError(f"window must be at least 1, got {window!r}")
+        if not 0 <= max_failure_rate < 1:
+            raise ValueError(
+                f"max_failure_rate must be in [0, 1), got {max_failure_rate!r}"
+            )
+
+        self.k = k
+        self.max_failure_rate = max_failure_rate
+        self._outcomes: deque[bool] = deque(maxlen=window)
+
+    @property
+    def failure_rate(self) -> float:
+        """The share of failed attempts in the window, 0 if nothing was recorded."""
+        outcomes = self._outcomes
+        return sum(outcomes) / len(outcomes) if outcomes else 0.0
+
+    def record(self, failed: bool) -> None:
+        """
+        Records the outcome of an attempt.
+
+        :param failed: whether the attempt raised a retried exception.
+        """
+        self._outcomes.append(failed)
+
+    def next_delay(self, delay: Union[int, float]) -> float:
+        """
+        Computes the delay before the next attempt.
+
+        :param delay: the initial delay between attempts.
+        :returns: the delay scaled by the current contention estimate.
+        """
+        p = min(self.failure_rate, self.max_failure_rate)
+        return delay * (1 + self.k * p / (1 - p))
@@ -1,9 +1,21 @@
+import asyncio
+import math
+import os
 import time
 from unittest.mock import MagicMock
 
 import pytest
 
-from retry.api import retry, retry_call
+from retry.api import (
+    NS_PER_SECOND,
+    RetryConfig,
+    _JitterPool,
+    retry,
+    retry_async,
+    retry_call,
+    retry_call_async,
+)
+from retry.backoff import AdaptiveBackoff
 
 
 def test_retry(monkeypatch):
@@ -31,6 +43,16 @@ def test_retry(monkeypatch):
     assert mock_sleep_time[0] == sum(delay * backoff**i for i in range(tries - 1))
 
 
+def test_retry_preserves_metadata():
+    @retry()
+    def f():
+        """docstring"""
+
+    assert f.__name__ == "f"
+    assert f.__doc__ == "docstring"
+    assert f.__wrapped__ is not None
+
+
 def test_tries_inf():
     hit = [0]
     target = 10
@@ -59,6 +81,29 @@ def test_tries_minus1():
     assert f() == target
 
 
+def test_retry_call_tries_minus1():
+    target = 10
+    side_effect = [ValueError] * (target - 1) + [target]
+    f_mock = MagicMock(side_effect=side_effect)
+
+    assert retry_call(f_mock, tries=-1) == target
+    assert f_mock.call_count == target
+
+
+def test_retry_async_tries_minus1():
+    hit = [0]
+    target = 10
+
+    @retry(tries=-1)
+    async def f():
+        hit[0] += 1
+        if hit[0] == target:
+            return target
+        raise ValueError
+
+    assert asyncio.run(f()) == target
+
+
 def test_max_delay(monkeypatch):
     mock_sleep_time = [0]
 
@@ -85,6 +130,16 @@ def test_max_delay(monkeypatch):
     assert mock_sleep_time[0] == delay * (tries - 1)
 
 
+def test_infinite_max_delay(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+
+    f_mock = MagicMock(side_effect=RuntimeError)
+    with pytest.raises(RuntimeError):
+        retry_call(f_mock, tries=4, delay=1, backoff=2, max_delay=math.inf)
+    assert sleeps == [1, 2, 4]
+
+
 def test_fixed_jitter(monkeypatch):
     mock_sleep_time = [0]
 
@@ -109,6 +164,94 @@ def test_fixed_jitter(monkeypatch):
     assert mock_sleep_time[0] == sum(range(tries - 1))
 
 
+def test_random_jitter(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+
+    tries = 10
+    delay = 1
+    jitter = (1, 2)
+
+    @retry(tries=tries, delay=delay, jitter=jitter)
+    def f():
+        1 / 0
+
+    with pytest.raises(ZeroDivisionError):
+        f()
+    assert len(sleeps) == tries - 1
+    assert sleeps[0] == delay
+    for previous, seconds in zip(sleeps, sleeps[1:]):
+        assert previous + jitter[0] <= seconds <= previous + jitter[1]
+
+
+def test_jitter_pool():
+    pool = _JitterPool(1_000, 2_000)
+    values = pool.values
+    assert len(values) == _JitterPool.SIZE
+    assert all(1_000 <= value <= 2_000 for value in values)
+
+    draws = [pool.draw() for _ in range(_JitterPool.SIZE)]
+    assert sorted(draws) == sorted(values)
+
+    for _ in range(_JitterPool.REFRESH):
+        pool.draw()
+    assert pool.values is not values
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_jitter_pool_reseeded_after_fork():
+    pool = _JitterPool(0, NS_PER_SECOND)
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if not pid:
+        try:
+            os.write(write_fd, repr(pool.values).encode())
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        child_values = pipe.read()
+    os.waitpid(pid, 0)
+    assert child_values
+    assert child_values != repr(pool.values)
+
+
+def test_jitter_pool_only_for_fixed_decorators():
+    def config(**kwargs):
+        arguments = dict(
+            exceptions=Exception,
+            tries=-1,
+            delay=0,
+            max_delay=None,
+            backoff=1,
+            jitter=(1, 2),
+            logger=None,
+            jitter_mode="fixed",
+            should_retry=None,
+        )
+        arguments.update(kwargs)
+        return RetryConfig(**arguments)
+
+    assert isinstance(config(pool_jitter=True).jitter, _JitterPool)
+    assert config().jitter == (1_000_000_000, 2_000_000_000)
+    assert config(jitter_mode="full", jitter=0, pool_jitter=True).jitter == 0
+    assert config(jitter_mode="decorrelated", jitter=0, pool_jitter=True).jitter == 0
+
+
+def test_retry_call_random_jitter(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+
+    f_mock = MagicMock(side_effect=RuntimeError)
+    with pytest.raises(RuntimeError):
+        retry_call(f_mock, tries=5, delay=1, jitter=(1, 2))
+
+    assert sleeps[0] == 1
+    for previous, seconds in zip(sleeps, sleeps[1:]):
+        assert previous + 1 <= seconds <= previous + 2
+
+
 def test_retry_call():
     f_mock = MagicMock(side_effect=RuntimeError)
     tries = 2
@@ -168,3 +311,325 @@ def test_retry_call_with_kwargs():
 
     assert result == kwargs["value"]
     assert f_mock.call_count == 1
+
+
+def test_zero_delay_skips_sleep(monkeypatch):
+    sleep_calls = [0]
+
+    def mock_sleep(seconds):
+        sleep_calls[0] += 1
+
+    monkeypatch.setattr(time, "sleep", mock_sleep)
+
+    tries = 5
+
+    @retry(tries=tries)
+    def f():
+        1 / 0
+
+    with pytest.raises(ZeroDivisionError):
+        f()
+    assert sleep_calls[0] == 0
+
+
+def test_full_jitter(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+
+    tries = 6
+    delay = 1
+    backoff = 2
+    max_delay = 8
+    hit = [0]
+    logger = MagicMock()
+
+    @retry(
+        tries=tries,
+        delay=delay,
+        backoff=backoff,
+        max_delay=max_delay,
+        logger=logger,
+        jitter_mode="full",
+    )
+    def f():
+        hit[0] += 1
+        1 / 0
+
+    with pytest.raises(ZeroDivisionError):
+        f()
+    assert hit[0] == tries
+    # the warning is logged before every sleep, zero sleeps included
+    sleeps = [c.args[2] for c in logger.warning.call_args_list]
+    assert len(sleeps) == tries - 1
+    for i, seconds in enumerate(sleeps):
+        assert 0 <= seconds <= min(max_delay, delay * backoff**i)
+
+
+def test_decorrelated_jitter(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+
+    tries = 10
+    delay = 1
+    max_delay = 5
+
+    @retry(tries=tries, delay=delay, max_delay=max_delay, jitter_mode="decorrelated")
+    def f():
+        1 / 0
+
+    with pytest.raises(ZeroDivisionError):
+        f()
+    assert len(sleeps) == tries - 1
+    assert delay <= sleeps[0] <= min(max_delay, delay * 3)
+    for previous, seconds in zip(sleeps, sleeps[1:]):
+        assert delay <= seconds <= min(max_delay, previous * 3)
+
+
+def test_decorrelated_jitter_first_sleep(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+
+    f_mock = MagicMock(side_effect=RuntimeError)
+    for _ in range(20):
+        with pytest.raises(RuntimeError):
+            retry_call(f_mock, tries=2, delay=1, jitter_mode="decorrelated")
+
+    assert len(set(sleeps)) > 1
+
+
+def test_unknown_jitter_mode():
+    f_mock = MagicMock()
+    with pytest.raises(ValueError):
+        retry_call(f_mock, jitter_mode="linear")
+    assert f_mock.call_count == 0
+
+    with pytest.raises(ValueError):
+        retry(jitter_mode="linear")
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"jitter_mode": "full", "jitter": 1},
+        {"jitter_mode": "full", "jitter": (0, 1)},
+        {"jitter_mode": "decorrelated", "jitter": 0.5},
+        {"jitter_mode": "decorrelated", "backoff": 2},
+        {"jitter_mode": "decorrelated", "backoff": AdaptiveBackoff()},
+    ],
+)
+def test_jitter_mode_unsupported_arguments(kwargs):
+    f_mock = MagicMock()
+    with pytest.raises(ValueError):
+        retry_call(f_mock, **kwargs)
+    assert f_mock.call_count == 0
+
+    with pytest.raises(ValueError):
+        retry(**kwargs)
+
+
+def test_adaptive_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+
+    tries = 4
+    delay = 1
+    backoff = AdaptiveBackoff(k=1, window=4)
+
+    @retry(tries=tries, delay=delay, backoff=backoff)
+    def f():
+        1 / 0
+
+    with pytest.raises(ZeroDivisionError):
+        f()
+    assert backoff.failure_rate == 1
+    # every attempt in the window failed, so p is capped at max_failure_rate
+    assert sleeps == pytest.approx([delay * (1 + 0.95 / 0.05)] * (tries - 1))
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"max_failure_rate": 1}, {"max_failure_rate": -0.1}, {"window": 0}]
+)
+def test_adaptive_backoff_invalid_arguments(kwargs):
+    with pytest.raises(ValueError):
+        AdaptiveBackoff(**kwargs)
+
+
+def test_adaptive_backoff_records_success():
+    backoff = AdaptiveBackoff(k=2, window=4)
+    side_effect = [RuntimeError, 3]
+    f_mock = MagicMock(side_effect=side_effect)
+
+    assert retry_call(f_mock, exceptions=RuntimeError, backoff=backoff) == 3
+    assert backoff.failure_rate == 0.5
+    assert backoff.next_delay(1) == 1 + 2 * 0.5 / 0.5
+
+
+def test_logger_warning():
+    logger = MagicMock()
+    logger.isEnabledFor.return_value = True
+    error = RuntimeError("boom")
+    f_mock = MagicMock(side_effect=[error, 3])
+
+    assert retry_call(f_mock, exceptions=RuntimeError, delay=0, logger=logger) == 3
+    logger.warning.assert_called_once_with("%s, retrying in %s seconds...", error, 0)
+
+
+def test_logger_warning_whole_seconds(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    logger = MagicMock()
+    logger.isEnabledFor.return_value = True
+    f_mock = MagicMock(side_effect=[RuntimeError, RuntimeError, 3])
+
+    assert retry_call(f_mock, delay=1, backoff=1.5, logger=logger) == 3
+    delays = [call.args[2] for call in logger.warning.call_args_list]
+    assert delays == [1, 1.5]
+    assert isinstance(delays[0], int)
+
+
+def test_logger_disabled_level():
+    logger = MagicMock()
+    logger.isEnabledFor.return_value = False
+    f_mock = MagicMock(side_effect=[RuntimeError, 3])
+
+    assert retry_call(f_mock, exceptions=RuntimeError, logger=logger) == 3
+    logger.warning.assert_not_called()
+
+
+def test_logger_without_is_enabled_for():
+    # e.g. loguru, whose logger only has the logging methods
+    logger = MagicMock(spec=["warning"])
+    error = RuntimeError("boom")
+    f_mock = MagicMock(side_effect=[error, 3])
+
+    assert retry_call(f_mock, exceptions=RuntimeError, logger=logger) == 3
+    logger.warning.assert_called_once_with("%s, retrying in %s seconds...", error, 0)
+
+
+def test_logger_not_checked_on_success():
+    logger = MagicMock()
+    f_mock = MagicMock(return_value=3)
+
+    assert retry_call(f_mock, logger=logger) == 3
+    logger.isEnabledFor.assert_not_called()
+
+
+def test_fractional_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+
+    tries = 5
+    delay = 0.1
+    backoff = 1.5
+
+    @retry(tries=tries, delay=delay, backoff=backoff)
+    def f():
+        1 / 0
+
+    with pytest.raises(ZeroDivisionError):
+        f()
+    assert sleeps == [0.1, 0.15, 0.225, 0.3375]
+
+
+def test_retry_coroutine_function(monkeypatch):
+    sleeps = []
+
+    async def mock_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(asyncio, "sleep", mock_sleep)
+    monkeypatch.setattr(time, "sleep", MagicMock(side_effect=AssertionError))
+
+    hit = [0]
+
+    tries = 5
+    delay = 1
+    backoff = 2
+
+    @retry(tries=tries, delay=delay, backoff=backoff)
+    async def f():
+        hit[0] += 1
+        1 / 0
+
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(f())
+    assert hit[0] == tries
+    assert sleeps == [delay * backoff**i for i in range(tries - 1)]
+
+
+def test_retry_async_yields_between_attempts():
+    ready = [False]
+
+    # without a yield between attempts set_ready never runs and tries run out
+    @retry(tries=3, logger=None)
+    async def wait_ready():
+        if not ready[0]:
+            raise RuntimeError
+        return True
+
+    async def set_ready():
+        ready[0] = True
+
+    async def main():
+        task = asyncio.ensure_future(set_ready())
+        result = await wait_ready()
+        await task
+        return result
+
+    assert asyncio.run(main())
+
+
+def test_retry_async_preserves_metadata():
+    @retry_async()
+    async def f():
+        """docstring"""
+        return 3
+
+    assert f.__name__ == "f"
+    assert f.__doc__ == "docstring"
+    assert asyncio.run(f()) == 3
+
+
+def test_retry_call_async():
+    side_effect = [RuntimeError, RuntimeError, 3]
+    hit = [0]
+
+    async def f(value, offset=0):
+        result = side_effect[hit[0]]
+        hit[0] += 1
+        if isinstance(result, type):
+            raise result
+        return result * value + offset
+
+    result = asyncio.run(
+        retry_call_async(
+            f, f_args=[2], f_kwargs={"offset": 1}, exceptions=RuntimeError, tries=5
+        )
+    )
+    assert result == 7
+    assert hit[0] == len(side_effect)
+
+
+def test_should_retry():
+    class HTTPError(Exception):
+        def __init__(self, status):
+            self.status = status
+
+    side_effect = [HTTPError(503), HTTPError(400), 3]
+    f_mock = MagicMock(side_effect=side_effect)
+
+    with pytest.raises(HTTPError) as exc_info:
+        retry_call(f_mock, should_retry=lambda e: e.status >= 500)
+    assert exc_info.value.status == 400
+    assert f_mock.call_count == 2
+
+
+def test_should_retry_async():
+    hit = [0]
+
+    @retry(should_retry=lambda e: not isinstance(e, ZeroDivisionError))
+    async def f():
+        hit[0] += 1
+        1 / 0
+
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(f())
+    assert hit[0] == 1